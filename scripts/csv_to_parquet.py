@@ -0,0 +1,16 @@
+import sys
+import os
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+def csv_to_parquet(src, dst):
+    """Convert a CSV dataset to a snappy-compressed Parquet file"""
+    table = pacsv.read_csv(src)
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    pq.write_table(table, dst, compression='snappy')
+    print(f"✅ Converted {src} -> {dst} ({table.num_rows} rows)")
+
+if __name__ == '__main__':
+    src = sys.argv[1] if len(sys.argv) > 1 else 'data/raw/train.csv'
+    dst = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(src)[0] + '.parquet'
+    csv_to_parquet(src, dst)
@@ -1,25 +1,40 @@
+import errno
 import shutil
-import json
+import orjson
 import yaml
+from functools import lru_cache
 import os
-import mlflow
-from mlflow.tracking import MlflowClient
 
+@lru_cache(maxsize=1)
 def load_params():
+    """Parse params.yaml once per process, using libyaml when available"""
     with open('params.yaml', 'r') as f:
-        params = yaml.safe_load(f)
-    return params
+        return yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+# link() errors that mean "can't hardlink here", as opposed to a missing source
+_NO_LINK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP, errno.ENOTSUP}
+
+def link_or_copy(src, dst):
+    """Hardlink src to dst, or copy it where hardlinks aren't possible. Either
+    way dst is swapped in with os.replace, so a server that has the old file
+    memory-mapped never sees it rewritten in place."""
+    tmp = f"{dst}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError as e:
+        if e.errno not in _NO_LINK_ERRNOS:
+            raise
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
 
 def promote_model():
     params = load_params()
     
-    # Configure MLflow
-    mlflow.set_tracking_uri(params['mlflow']['tracking_uri'])
-    client = MlflowClient()
-    
     # Load evaluation metrics
-    with open('metrics/eval_metrics.json', 'r') as f:
-        metrics = json.load(f)
+    with open('metrics/eval_metrics.json', 'rb') as f:
+        metrics = orjson.loads(f.read())
     
     accuracy = metrics['accuracy']
     min_accuracy = params['promote']['min_accuracy']
@@ -31,14 +46,22 @@ def promote_model():
         # Create production directory
         os.makedirs('models/production', exist_ok=True)
         
-        # Copy model from staging to production
-        shutil.copy2(
+        # Link model from staging to production
+        link_or_copy(
             params['promote']['staging_model'],
             params['promote']['production_model']
         )
+        link_or_copy(
+            params['promote']['staging_onnx'],
+            params['promote']['production_onnx']
+        )
         
         # Promote model in MLflow Model Registry
         try:
+            # Imported lazily: the local promotion path doesn't need MLflow.
+            # One client serves both registry calls below.
+            from mlflow.tracking import MlflowClient
+            client = MlflowClient(tracking_uri=params['mlflow']['tracking_uri'])
             model_name = params['mlflow']['model_name']
             
             # Get the latest version in None/Staging
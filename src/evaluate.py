@@ -1,76 +1,88 @@
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
-import joblib
-import json
+import numpy as np
+import orjson
 import yaml
+from functools import lru_cache
 import os
-import mlflow
-import mlflow.sklearn
+import time
 
+@lru_cache(maxsize=1)
 def load_params():
+    """Parse params.yaml once per process, using libyaml when available"""
     with open('params.yaml', 'r') as f:
-        params = yaml.safe_load(f)
-    return params
+        return yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
 
-def evaluate_model():
-    params = load_params()
+def _cls_metrics(y_true, y_pred):
+    """Accuracy and weighted precision/recall/F1 derived from one confusion matrix"""
+    from sklearn.metrics import confusion_matrix
     
-    # Configure MLflow
-    mlflow.set_tracking_uri(params['mlflow']['tracking_uri'])
+    labels = np.union1d(y_true, y_pred)
+    cm = confusion_matrix(y_true, y_pred, labels=labels)
+    tp = np.diag(cm)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
     
-    # Load data
-    df = pd.read_csv('data/raw/train.csv')
-    X = df.drop('target', axis=1)
-    y = df['target']
+    precision = tp / np.maximum(predicted, 1)
+    recall = tp / np.maximum(support, 1)
+    denom = precision + recall
+    f1 = np.divide(2 * precision * recall, denom, out=np.zeros_like(denom), where=denom > 0)
+    weights = support / support.sum()
     
-    # Split data (same split as training)
-    _, X_test, _, y_test = train_test_split(
-        X, y,
-        test_size=params['train']['test_size'],
-        random_state=params['train']['random_state']
-    )
-    
-    # Load model
-    model = joblib.load('models/staging/model.pkl')
+    return {
+        'accuracy': tp.sum() / cm.sum(),
+        'precision': precision @ weights,
+        'recall': recall @ weights,
+        'f1_score': f1 @ weights,
+        'confusion_matrix': cm
+    }
+
+def evaluate_model():
+    params = load_params()
     
-    # Make predictions
-    y_pred = model.predict(X_test)
+    # Load the test labels and predictions saved by train.py
+    y_test = np.load('data/processed/y_test.npy')
+    y_pred = np.load('data/processed/y_test_pred.npy')
     
     # Calculate metrics
-    accuracy = accuracy_score(y_test, y_pred)
-    precision = precision_score(y_test, y_pred, average='weighted')
-    recall = recall_score(y_test, y_pred, average='weighted')
-    f1 = f1_score(y_test, y_pred, average='weighted')
-    conf_matrix = confusion_matrix(y_test, y_pred)
+    results = _cls_metrics(y_test, y_pred)
+    accuracy = results['accuracy']
+    precision = results['precision']
+    recall = results['recall']
+    f1 = results['f1_score']
     
     metrics = {
         'accuracy': float(accuracy),
         'precision': float(precision),
         'recall': float(recall),
         'f1_score': float(f1),
-        'confusion_matrix': conf_matrix.tolist()
+        'confusion_matrix': results['confusion_matrix']
     }
     
     # Log evaluation metrics to MLflow (if run_id exists)
     try:
-        with open('metrics/train_metrics.json', 'r') as f:
-            train_metrics = json.load(f)
+        with open('metrics/train_metrics.json', 'rb') as f:
+            train_metrics = orjson.loads(f.read())
             if 'mlflow_run_id' in train_metrics:
-                with mlflow.start_run(run_id=train_metrics['mlflow_run_id']):
-                    mlflow.log_metrics({
-                        'eval_accuracy': accuracy,
-                        'eval_precision': precision,
-                        'eval_recall': recall,
-                        'eval_f1_score': f1
-                    })
+                from mlflow.entities import Metric
+                from mlflow.tracking import MlflowClient
+                
+                eval_metrics = {
+                    'eval_accuracy': accuracy,
+                    'eval_precision': precision,
+                    'eval_recall': recall,
+                    'eval_f1_score': f1
+                }
+                timestamp = int(time.time() * 1000)
+                MlflowClient(tracking_uri=params['mlflow']['tracking_uri']).log_batch(
+                    train_metrics['mlflow_run_id'],
+                    metrics=[Metric(k, float(v), timestamp, 0) for k, v in eval_metrics.items()]
+                )
     except Exception as e:
         print(f"⚠️ Could not log to MLflow: {e}")
     
     # Save metrics
     os.makedirs('metrics', exist_ok=True)
-    with open('metrics/eval_metrics.json', 'w') as f:
-        json.dump(metrics, f, indent=2)
+    with open('metrics/eval_metrics.json', 'wb') as f:
+        f.write(orjson.dumps(metrics, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
     
     print(f"✅ Model evaluated - Accuracy: {metrics['accuracy']:.4f}")
     print(f"   Precision: {metrics['precision']:.4f}")
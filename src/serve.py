@@ -1,29 +1,70 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, field_validator
+from typing import Annotated, List
+import asyncio
 import joblib
 import numpy as np
 import os
-import mlflow
-import mlflow.sklearn
+import pickle
 import yaml
+from functools import lru_cache
 
-app = FastAPI(title="MLOps Model Serving API with MLflow")
+app = FastAPI(
+    title="MLOps Model Serving API with MLflow",
+    default_response_class=ORJSONResponse
+)
+app.add_middleware(GZipMiddleware, minimum_size=256)
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    # Rejected NaN/Infinity inputs are echoed back in the errors; orjson writes
+    # them as null where the stdlib encoder would fail with a 500
+    return ORJSONResponse(status_code=422, content={"detail": jsonable_encoder(exc.errors())})
 
 # Global variables
 model = None
 model_version = None
 model_source = None
+onnx_session = None
+n_features = None
+
+# Micro-batching: concurrent /predict calls are scored together
+MAX_BATCH = 64
+BATCH_WINDOW = 0.005  # seconds
+_queue = None
+_batcher = None
+_buf = None  # (MAX_BATCH, n_features) float32 scratch, owned by the batch worker
 
+@lru_cache(maxsize=1)
 def load_params():
+    """Parse params.yaml once per process, using libyaml when available"""
     with open('params.yaml', 'r') as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+def load_model_file(path):
+    """Load a model written by train.save_model"""
+    if path.endswith('.zst'):
+        import zstandard
+        with open(path, 'rb') as f:
+            with zstandard.ZstdDecompressor().stream_reader(f) as reader:
+                return pickle.loads(reader.read())
+    return joblib.load(path, mmap_mode='r')
 
 @app.on_event("startup")
 async def load_model():
-    global model, model_version, model_source
+    global model, model_version, model_source, onnx_session, n_features, _buf
     
     # Try loading from MLflow first
     try:
+        # Imported lazily so the local fallback doesn't pay MLflow's import cost
+        import mlflow
+        import mlflow.sklearn
+        
         params = load_params()
         mlflow.set_tracking_uri(params['mlflow']['tracking_uri'])
         model_name = params['mlflow']['model_name']
@@ -38,21 +79,118 @@ async def load_model():
         print(f"⚠️ Could not load from MLflow: {e}")
         
         # Fallback to local model
-        MODEL_PATH = 'models/production/model.pkl'
+        MODEL_PATHS = ['models/production/model.pkl', 'models/production/model.pkl.zst']
+        existing = [path for path in MODEL_PATHS if os.path.exists(path)]
+        MODEL_PATH = max(existing, key=os.path.getmtime) if existing else MODEL_PATHS[0]
         if os.path.exists(MODEL_PATH):
-            model = joblib.load(MODEL_PATH)
+            model = load_model_file(MODEL_PATH)
             model_source = "Local filesystem"
             model_version = "latest"
             print(f"✅ Model loaded from {MODEL_PATH}")
+            
+            # Prefer the ONNX export promoted alongside the local model
+            ONNX_PATH = 'models/production/model.onnx'
+            if os.path.exists(ONNX_PATH):
+                import onnxruntime as ort
+                onnx_session = ort.InferenceSession(ONNX_PATH, providers=['CPUExecutionProvider'])
+                print(f"✅ ONNX runtime loaded from {ONNX_PATH}")
         else:
             print(f"❌ Model not found at {MODEL_PATH}")
+    
+    if model is not None:
+        n_features = model.n_features_in_
+        _buf = np.empty((MAX_BATCH, n_features), dtype=np.float32)
+
+def _predict_proba(X):
+    """Class probabilities for float32 rows, via ONNX runtime when available"""
+    if onnx_session is not None:
+        return onnx_session.run(None, {'X': X})[1]
+    return model.predict_proba(X)
+
+def _score(X):
+    """Labels and class probabilities for a block of float32 rows"""
+    # Derive labels from the class probabilities instead of a second predict pass
+    probabilities = _predict_proba(X)
+    return model.classes_[probabilities.argmax(axis=1)], probabilities
+
+async def _batch_worker():
+    """Collect queued /predict requests for up to BATCH_WINDOW and score them in one call"""
+    loop = asyncio.get_running_loop()
+    while True:
+        items = [await _queue.get()]
+        deadline = loop.time() + BATCH_WINDOW
+        while len(items) < MAX_BATCH:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        # Copy rows into the preallocated buffer; a bad row only fails its own request
+        futures = []
+        for features, future in items:
+            try:
+                row = _buf[len(futures)]
+                row[:] = features
+                # PredictionRequest already rejects these; this guards callers that
+                # put rows on _queue directly
+                if not np.isfinite(row).all():
+                    raise ValueError("features must be finite and within float32 range")
+                futures.append(future)
+            except (TypeError, ValueError) as e:
+                if not future.done():
+                    future.set_exception(e)
+        if not futures:
+            continue
+        
+        try:
+            predictions, probabilities = _score(_buf[:len(futures)])
+        except Exception:
+            # Score rows one at a time so only the ones that fail get an error
+            for i, future in enumerate(futures):
+                try:
+                    prediction, probability = _score(_buf[i:i + 1])
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                if not future.done():
+                    future.set_result((int(prediction[0]), probability[0].tolist()))
+            continue
+        
+        for i, future in enumerate(futures):
+            if not future.done():
+                future.set_result((int(predictions[i]), probabilities[i].tolist()))
+
+@app.on_event("startup")
+async def start_batcher():
+    global _queue, _batcher
+    _queue = asyncio.Queue()
+    _batcher = asyncio.create_task(_batch_worker())
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    if _batcher is not None:
+        _batcher.cancel()
+
+FLOAT32_MAX = float(np.finfo(np.float32).max)
 
 class PredictionRequest(BaseModel):
-    features: list
+    features: List[Annotated[float, Field(allow_inf_nan=False, ge=-FLOAT32_MAX, le=FLOAT32_MAX)]] = Field(min_length=1)
+    
+    @field_validator('features')
+    @classmethod
+    def check_features(cls, features):
+        # Checked against the loaded model; without one /predict answers 503
+        if n_features is not None and len(features) != n_features:
+            raise ValueError(f"expected {n_features} features, got {len(features)}")
+        return features
 
 class PredictionResponse(BaseModel):
     prediction: int
-    probability: list
+    probability: List[float]
     model_version: str
     model_source: str
 
@@ -82,6 +220,7 @@ async def model_info():
         "model_source": model_source,
         "model_version": model_version,
         "model_type": type(model).__name__,
+        "runtime": "onnxruntime" if onnx_session is not None else "sklearn",
         "model_params": model.get_params() if hasattr(model, 'get_params') else {}
     }
 
@@ -91,12 +230,10 @@ async def predict(request: PredictionRequest):
         raise HTTPException(status_code=503, detail="Model not loaded")
     
     try:
-        # Convert features to numpy array
-        features = np.array(request.features).reshape(1, -1)
-        
-        # Make prediction
-        prediction = int(model.predict(features)[0])
-        probability = model.predict_proba(features)[0].tolist()
+        # Queue for the batch worker and wait for this row's result
+        future = asyncio.get_running_loop().create_future()
+        await _queue.put((request.features, future))
+        prediction, probability = await future
         
         return PredictionResponse(
             prediction=prediction,
@@ -107,6 +244,60 @@ async def predict(request: PredictionRequest):
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Prediction error: {str(e)}")
 
+@app.post("/predict-batch")
+async def predict_batch(request: Request):
+    """Score an Arrow IPC stream of feature rows and return an Arrow IPC stream"""
+    if model is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    
+    # Imported lazily so workers that never serve batches don't pay for pyarrow
+    import pyarrow as pa
+    
+    try:
+        table = pa.ipc.open_stream(await request.body()).read_all()
+        # Match columns by name when the model knows its feature names
+        feature_names = getattr(model, 'feature_names_in_', None)
+        if feature_names is not None:
+            missing = [name for name in feature_names if name not in table.column_names]
+            if missing:
+                raise ValueError(f"missing feature columns: {missing}")
+            table = table.select(list(feature_names))
+        X = np.ascontiguousarray(table.to_pandas().to_numpy(dtype=np.float32))
+        if X.shape[1] != n_features:
+            raise ValueError(f"expected {n_features} feature columns, got {X.shape[1]}")
+        # Nulls, NaN/inf and values beyond float32 range all end up non-finite here
+        bad_rows = np.flatnonzero(~np.isfinite(X).all(axis=1))
+        if bad_rows.size:
+            raise ValueError(f"rows with missing or non-finite features: {bad_rows.tolist()}")
+        
+        # One vectorized call for the whole batch, off the event loop
+        probabilities = await run_in_threadpool(_predict_proba, X)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Prediction error: {str(e)}")
+    
+    result = pa.table({
+        'prediction': model.classes_[probabilities.argmax(axis=1)],
+        **{f'p{label}': probabilities[:, i] for i, label in enumerate(model.classes_)}
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, result.schema) as writer:
+        writer.write_table(result)
+    
+    return Response(
+        content=sink.getvalue().to_pybytes(),
+        media_type="application/vnd.apache.arrow.stream"
+    )
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Workers import the app by name, so resolve `src` from the repo root
+    uvicorn.run(
+        "src.serve:app",
+        app_dir=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        timeout_keep_alive=30,
+        workers=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+    )
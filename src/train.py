@@ -5,26 +5,62 @@ from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 import joblib
-import json
+import pickle
+import orjson
 import yaml
+from functools import lru_cache
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import mlflow
 import mlflow.sklearn
+from mlflow.entities import Metric, Param
+from mlflow.tracking import MlflowClient
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
 
+@lru_cache(maxsize=1)
 def load_params():
+    """Parse params.yaml once per process, using libyaml when available"""
     with open('params.yaml', 'r') as f:
-        params = yaml.safe_load(f)
-    return params
+        return yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
 
-def create_sample_data():
+def _read_table(path, columns):
+    """Read a Parquet or CSV dataset, projecting only the requested columns"""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=columns, engine='pyarrow')
+    if os.environ.get('FAST_IO') == '1':
+        import pyarrow.csv as pacsv
+        return pacsv.read_csv(
+            path,
+            read_options=pacsv.ReadOptions(use_threads=True),
+            convert_options=pacsv.ConvertOptions(include_columns=columns)
+        ).to_pandas()
+    return pd.read_csv(path, usecols=columns)[columns]
+
+def create_sample_data(path):
     """Create sample data if not exists"""
-    os.makedirs('data/raw', exist_ok=True)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
     iris = load_iris()
     df = pd.DataFrame(iris.data, columns=iris.feature_names)
     df['target'] = iris.target
-    df.to_csv('data/raw/train.csv', index=False)
+    if path.endswith('.parquet'):
+        df.to_parquet(path, engine='pyarrow', compression='snappy', index=False)
+    else:
+        df.to_csv(path, index=False)
     print("✅ Sample data created")
 
+def save_model(model, path):
+    """Pickle the model with protocol 5; '.zst' paths are zstd-compressed, others
+    are left uncompressed so serve.py can memory-map the arrays on load"""
+    if path.endswith('.zst'):
+        import zstandard
+        with open(path, 'wb') as f:
+            with zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(f) as writer:
+                pickle.dump(model, writer, protocol=5)
+    else:
+        joblib.dump(model, path, compress=0, protocol=5)
+
 def train_model():
     params = load_params()
     
@@ -33,35 +69,52 @@ def train_model():
     mlflow.set_experiment(params['mlflow']['experiment_name'])
     
     # Load data
-    if not os.path.exists('data/raw/train.csv'):
-        create_sample_data()
+    data_path = params['data']['raw']
+    if not os.path.exists(data_path):
+        create_sample_data(data_path)
     
-    df = pd.read_csv('data/raw/train.csv')
-    X = df.drop('target', axis=1)
-    y = df['target']
+    features = params['data']['features']
+    target = params['data']['target']
+    df = _read_table(data_path, columns=[*features, target])
+    # Downcast to the narrowest dtypes; the tree builder works in float32 anyway
+    X = df[features].apply(pd.to_numeric, downcast='float')
+    y = pd.to_numeric(df[target], downcast='integer')
     
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, 
+    # Split row positions once and index both frames with them
+    train_idx, test_idx = train_test_split(
+        np.arange(len(df)),
         test_size=params['train']['test_size'],
         random_state=params['train']['random_state']
     )
+    X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
+    y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
     
-    # Start MLflow run
-    with mlflow.start_run() as run:
-        # Log parameters
-        mlflow.log_params({
+    # Start MLflow run; tracking calls go through a single background thread
+    # so training never waits on the tracking server
+    with mlflow.start_run() as run, ThreadPoolExecutor(max_workers=1) as tracker:
+        client = MlflowClient()
+        
+        # Log parameters while the model trains
+        run_params = {
             'n_estimators': params['model']['n_estimators'],
             'max_depth': params['model']['max_depth'],
             'random_state': params['model']['random_state'],
+            'max_features': params['model']['max_features'],
             'test_size': params['train']['test_size']
-        })
+        }
+        pending = [tracker.submit(
+            client.log_batch,
+            run.info.run_id,
+            params=[Param(k, str(v)) for k, v in run_params.items()]
+        )]
         
         # Train model
         model = RandomForestClassifier(
             n_estimators=params['model']['n_estimators'],
             max_depth=params['model']['max_depth'],
-            random_state=params['model']['random_state']
+            random_state=params['model']['random_state'],
+            max_features=params['model']['max_features'],
+            n_jobs=params['model']['n_jobs']
         )
         model.fit(X_train, y_train)
         
@@ -69,6 +122,11 @@ def train_model():
         y_train_pred = model.predict(X_train)
         y_test_pred = model.predict(X_test)
         
+        # Hand the test labels and predictions to the evaluate stage
+        os.makedirs('data/processed', exist_ok=True)
+        np.save('data/processed/y_test.npy', y_test.to_numpy())
+        np.save('data/processed/y_test_pred.npy', y_test_pred)
+        
         # Calculate metrics
         train_accuracy = accuracy_score(y_train, y_train_pred)
         test_accuracy = accuracy_score(y_test, y_test_pred)
@@ -76,14 +134,23 @@ def train_model():
         recall = recall_score(y_test, y_test_pred, average='weighted')
         f1 = f1_score(y_test, y_test_pred, average='weighted')
         
-        # Log metrics to MLflow
-        mlflow.log_metrics({
+        # Log metrics to MLflow in a single background request
+        run_metrics = {
             'train_accuracy': train_accuracy,
             'test_accuracy': test_accuracy,
             'precision': precision,
             'recall': recall,
             'f1_score': f1
-        })
+        }
+        timestamp = int(time.time() * 1000)
+        pending.append(tracker.submit(
+            client.log_batch,
+            run.info.run_id,
+            metrics=[Metric(k, float(v), timestamp, 0) for k, v in run_metrics.items()]
+        ))
+        
+        # Serve single-threaded so /predict doesn't spin up a thread pool per call
+        model.n_jobs = 1
         
         # Log model to MLflow
         mlflow.sklearn.log_model(
@@ -94,7 +161,22 @@ def train_model():
         
         # Save model locally
         os.makedirs('models/staging', exist_ok=True)
-        joblib.dump(model, 'models/staging/model.pkl')
+        # Production may be a hardlink to these files (promote.py), so
+        # unlink them instead of overwriting the shared inode in place
+        model_path = params['promote']['staging_model']
+        for path in (model_path, params['promote']['staging_onnx']):
+            if os.path.exists(path):
+                os.remove(path)
+        save_model(model, model_path)
+        
+        # Export an ONNX copy of the model for serving
+        onx = convert_sklearn(
+            model,
+            initial_types=[('X', FloatTensorType([None, X_train.shape[1]]))],
+            options={id(model): {'zipmap': False}}
+        )
+        with open(params['promote']['staging_onnx'], 'wb') as f:
+            f.write(onx.SerializeToString())
         
         # Save metrics locally
         metrics = {
@@ -107,8 +189,12 @@ def train_model():
         }
         
         os.makedirs('metrics', exist_ok=True)
-        with open('metrics/train_metrics.json', 'w') as f:
-            json.dump(metrics, f, indent=2)
+        with open('metrics/train_metrics.json', 'wb') as f:
+            f.write(orjson.dumps(metrics, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+        
+        # Wait for background logging to finish (and surface its errors) before the run closes
+        for future in pending:
+            future.result()
         
         print(f"✅ Model trained - Train Accuracy: {train_accuracy:.4f}, Test Accuracy: {test_accuracy:.4f}")
         print(f"📊 MLflow Run ID: {run.info.run_id}")
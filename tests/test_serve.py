@@ -0,0 +1,152 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+
+from src import serve
+
+GOOD = [6.5, 3.0, 5.5, 1.8]
+TOO_LARGE = [1e300, 3.0, 4.8, 1.8]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Serve a small iris forest without MLflow or files on disk"""
+    iris = load_iris(as_frame=True)
+    model = RandomForestClassifier(n_estimators=10, random_state=0)
+    model.fit(iris.data, iris.target)
+    
+    # No params.yaml or models/ here, so startup leaves the model unset
+    monkeypatch.chdir(tmp_path)
+    # Widen the window so concurrent requests land in the same batch
+    monkeypatch.setattr(serve, 'BATCH_WINDOW', 0.2)
+    with TestClient(serve.app) as client:
+        monkeypatch.setattr(serve, 'model', model)
+        monkeypatch.setattr(serve, 'model_version', 'test')
+        monkeypatch.setattr(serve, 'model_source', 'test')
+        monkeypatch.setattr(serve, 'onnx_session', None)
+        monkeypatch.setattr(serve, 'n_features', 4)
+        monkeypatch.setattr(serve, '_buf', np.empty((serve.MAX_BATCH, 4), dtype=np.float32))
+        yield client
+
+
+def test_bad_row_does_not_fail_its_batch(client, monkeypatch):
+    # A row that passes validation but makes the model raise
+    poison = [999.0, 3.0, 5.5, 1.8]
+    predict_proba = serve._predict_proba
+    batch_sizes = []
+    
+    def flaky_predict_proba(X):
+        batch_sizes.append(len(X))
+        if (X[:, 0] == poison[0]).any():
+            raise ValueError("cannot score row")
+        return predict_proba(X)
+    
+    monkeypatch.setattr(serve, '_predict_proba', flaky_predict_proba)
+    with ThreadPoolExecutor(2) as pool:
+        good, bad = pool.map(
+            lambda features: client.post('/predict', json={'features': features}),
+            [GOOD, poison]
+        )
+    
+    # Both rows were scored together before the per-row fallback
+    assert batch_sizes[0] == 2
+    assert good.status_code == 200
+    assert good.json()['prediction'] == 2
+    assert bad.status_code == 400
+
+
+def test_batch_worker_fails_only_the_bad_row(client, monkeypatch):
+    async def run():
+        loop = asyncio.get_running_loop()
+        monkeypatch.setattr(serve, '_queue', asyncio.Queue())
+        worker = asyncio.create_task(serve._batch_worker())
+        futures = [loop.create_future() for _ in range(3)]
+        for features, future in zip([GOOD, TOO_LARGE, [float('nan')] * 4], futures):
+            await serve._queue.put((features, future))
+        try:
+            return await asyncio.gather(*futures, return_exceptions=True)
+        finally:
+            worker.cancel()
+    
+    good, too_large, nan = asyncio.run(run())
+    assert good[0] == 2
+    assert isinstance(too_large, ValueError)
+    assert isinstance(nan, ValueError)
+
+
+def _arrow(table):
+    import pyarrow as pa
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+@pytest.fixture
+def onnx_client(client):
+    """The same model served through an ONNX runtime session"""
+    import onnxruntime as ort
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+    
+    onx = convert_sklearn(
+        serve.model,
+        initial_types=[('X', FloatTensorType([None, 4]))],
+        options={id(serve.model): {'zipmap': False}}
+    )
+    session = ort.InferenceSession(onx.SerializeToString(), providers=['CPUExecutionProvider'])
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(serve, 'onnx_session', session)
+        yield client
+
+
+@pytest.mark.parametrize('runtime', ['client', 'onnx_client'])
+def test_predict_batch_matches_columns_by_name(request, runtime):
+    import pyarrow as pa
+    client = request.getfixturevalue(runtime)
+    rows = {
+        'sepal length (cm)': [5.1, 6.5],
+        'sepal width (cm)': [3.5, 3.0],
+        'petal length (cm)': [1.4, 5.5],
+        'petal width (cm)': [0.2, 1.8],
+    }
+    reordered = pa.table({name: rows[name] for name in reversed(list(rows))})
+    
+    response = client.post('/predict-batch', content=_arrow(reordered))
+    assert response.status_code == 200
+    assert pa.ipc.open_stream(response.content).read_all()['prediction'].to_pylist() == [0, 2]
+    
+    missing = reordered.drop(['petal width (cm)'])
+    response = client.post('/predict-batch', content=_arrow(missing))
+    assert response.status_code == 400
+    assert 'petal width (cm)' in response.json()['detail']
+    
+    # Nulls, NaN, inf and values that overflow float32 are rejected, naming the rows
+    for bad in [None, float('nan'), float('inf'), 1e300]:
+        table = pa.table({**rows, 'petal width (cm)': pa.array([0.2, bad], type=pa.float64())})
+        response = client.post('/predict-batch', content=_arrow(table))
+        assert response.status_code == 400
+        assert '[1]' in response.json()['detail']
+
+
+@pytest.mark.parametrize('features', [
+    [float('nan'), 3.0, 4.8, 1.8],
+    [float('inf'), 3.0, 4.8, 1.8],
+    TOO_LARGE,
+    [5.1, 3.5, 1.4],
+    [],
+])
+def test_predict_rejects_invalid_features(client, features):
+    import json
+    # Starlette's JSON parser accepts NaN/Infinity literals, so send them raw
+    response = client.post(
+        '/predict',
+        content=json.dumps({'features': features}),
+        headers={'Content-Type': 'application/json'}
+    )
+    assert response.status_code == 422